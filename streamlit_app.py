@@ -3,87 +3,246 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-from sklearn.preprocessing import StandardScaler, MinMaxScaler
+import plotly.io as pio
 import sqlite3
 import hashlib
+import hmac
+import io
+import os
+import threading
+
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = None
+
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = 'calamine'
+except ImportError:
+    EXCEL_ENGINE = None
+
+# Serialize figures with orjson instead of the stdlib json module
+pio.json.config.default_engine = 'orjson'
+
+# Row counts above which point-per-row charts are downsampled, and the size they are reduced to
+DOWNSAMPLE_THRESHOLD = 50000
+DOWNSAMPLE_TARGET = 20000
+
+# Number of colors drawn from a named colorscale for discrete traces
+THEME_COLOR_SAMPLES = 10
+
+# Let pandas defer copies until a column is actually written (always on, and deprecated, from pandas 3)
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.options.mode.copy_on_write = True
+
+# scrypt parameters for new password hashes
+SCRYPT_N = 2**14
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+# Column layout of the users table
+USERS_TABLE_SCHEMA = '''(
+                    username TEXT PRIMARY KEY,
+                    salt BLOB NOT NULL,
+                    hash BLOB NOT NULL,
+                    n INTEGER NOT NULL,
+                    r INTEGER NOT NULL,
+                    p INTEGER NOT NULL
+                )'''
 
 # Database setup
+@st.cache_resource
+def get_conn():
+    """Return a shared SQLite connection in WAL mode and the lock that serializes its use.
+
+    The connection is shared by every session thread and `with conn:` commits or rolls
+    back the whole connection, so each transaction must hold the lock.
+    """
+    conn = sqlite3.connect('users.db', check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn, threading.Lock()
+
 def create_users_table():
-    """Create a table to store user credentials if it doesn't exist."""
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-                    username TEXT PRIMARY KEY,
-                    password TEXT NOT NULL
-                )''')
-    conn.commit()
-    conn.close()
+    """Create a table to store user credentials if it doesn't exist, migrating the old layout."""
+    conn, lock = get_conn()
+    with lock:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(users)")]
+        if 'password' in columns:
+            # Pre-scrypt table of (username, password): keep the SHA-256 hex digests with
+            # n = 0 so verify_user can check them once and upgrade them to scrypt
+            try:
+                conn.executescript(f'''
+                    BEGIN;
+                    ALTER TABLE users RENAME TO users_legacy;
+                    CREATE TABLE users {USERS_TABLE_SCHEMA};
+                    INSERT INTO users (username, salt, hash, n, r, p)
+                        SELECT username, X'', CAST(password AS BLOB), 0, 0, 0 FROM users_legacy;
+                    DROP TABLE users_legacy;
+                    COMMIT;
+                ''')
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+        else:
+            with conn:
+                conn.execute(f"CREATE TABLE IF NOT EXISTS users {USERS_TABLE_SCHEMA}")
 
 # Password hashing
-def hash_password(password):
-    """Hash a password for storing."""
-    return hashlib.sha256(password.encode()).hexdigest()
+def hash_password(password, salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    """Hash a password with scrypt using the given salt and cost parameters."""
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, dklen=32)
+
+# Fresh salt and hash
+def new_password_hash(password):
+    """Return a new random salt and the scrypt hash of the password."""
+    salt = os.urandom(16)
+    return salt, hash_password(password, salt)
 
 # User registration
 def register_user(username, password):
     """Register a new user."""
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
+    conn, lock = get_conn()
+    with st.spinner("Creating account..."):
+        salt, password_hash = new_password_hash(password)
     try:
-        c.execute("INSERT INTO users (username, password) VALUES (?, ?)", 
-                  (username, hash_password(password)))
-        conn.commit()
+        with lock, conn:
+            conn.execute("INSERT INTO users (username, salt, hash, n, r, p) VALUES (?, ?, ?, ?, ?, ?)", 
+                         (username, salt, password_hash, SCRYPT_N, SCRYPT_R, SCRYPT_P))
+        get_user_record.clear()
         return True
     except sqlite3.IntegrityError:
         return False
-    finally:
-        conn.close()
+
+# Stored credentials lookup
+@st.cache_data(show_spinner=False, max_entries=128)
+def get_user_record(username):
+    """Return (salt, hash, n, r, p) for a user, or None. Cleared whenever a stored hash changes."""
+    conn, lock = get_conn()
+    with lock:
+        return conn.execute(
+            "SELECT salt, hash, n, r, p FROM users WHERE username = ?", (username,)
+        ).fetchone()
 
 # User login
 def verify_user(username, password):
     """Verify user credentials."""
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
-    c.execute("SELECT password FROM users WHERE username = ?", (username,))
-    result = c.fetchone()
-    conn.close()
-    if result and result[0] == hash_password(password):
+    result = get_user_record(username)
+    if result is None:
+        return False
+    salt, stored_hash, n, r, p = result
+    if n == 0:
+        # Account migrated from the old table: check the unsalted SHA-256 once, then rehash
+        legacy_hash = hashlib.sha256(password.encode()).hexdigest().encode()
+        if not hmac.compare_digest(stored_hash, legacy_hash):
+            return False
+        with st.spinner("Verifying..."):
+            salt, password_hash = new_password_hash(password)
+        conn, lock = get_conn()
+        with lock, conn:
+            conn.execute("UPDATE users SET salt = ?, hash = ?, n = ?, r = ?, p = ? WHERE username = ?",
+                         (salt, password_hash, SCRYPT_N, SCRYPT_R, SCRYPT_P, username))
+        get_user_record.clear()
         return True
-    return False
+    with st.spinner("Verifying..."):
+        password_hash = hash_password(password, salt, n, r, p)
+    return hmac.compare_digest(stored_hash, password_hash)
 
-# Function to load data
-def load_data(file):
-    """Load data with error handling."""
-    if file is None:
-        st.warning("Please upload a file.")
-        return None
+# Function to parse CSV bytes
+def read_csv(file_bytes):
+    """Parse CSV with pandas' multithreaded pyarrow engine, falling back to the C parser."""
+    if CSV_ENGINE is not None:
+        try:
+            df = pd.read_csv(io.BytesIO(file_bytes), engine=CSV_ENGINE)
+            # The C parser mangles repeated headers to 'a.1'; pyarrow may not
+            if not df.columns.has_duplicates:
+                return df
+        except ValueError:
+            # pyarrow.ArrowInvalid (e.g. quoted multi-line fields) subclasses ValueError
+            pass
+    return pd.read_csv(io.BytesIO(file_bytes))
+
+# Parsers keyed by file extension
+LOADERS = {
+    'csv': read_csv,
+    'xls': lambda b: pd.read_excel(io.BytesIO(b), engine=EXCEL_ENGINE),
+    'xlsx': lambda b: pd.read_excel(io.BytesIO(b), engine=EXCEL_ENGINE),
+    'json': lambda b: pd.read_json(io.BytesIO(b)),
+}
+
+# Function to shrink numeric dtypes
+def downcast_numeric(df):
+    """Downcast float columns to float32 and integers to the smallest fitting type."""
+    for col in df.select_dtypes(include=['float']).columns:
+        df[col] = pd.to_numeric(df[col], downcast='float')
+    for col in df.select_dtypes(include=['integer']).columns:
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+    return df
 
-    file_extension = file.name.split('.')[-1].lower()
+# Function to summarize data
+def summarize(df):
+    """Return shape, columns, missing-value counts and a sample of the dataframe."""
+    return {
+        'shape': df.shape,
+        'columns': df.columns.tolist(),
+        'missing': df.isnull().sum().to_dict(),
+        'head': df.head()
+    }
+
+# Function to load data
+@st.cache_data(show_spinner=False)
+def load_data(file_bytes, name):
+    """Load data and its summary with error handling. Cached on the file contents so reruns skip parsing."""
+    file_extension = name.split('.')[-1].lower()
+    loader = LOADERS.get(file_extension)
+    if loader is None:
+        st.error("Unsupported file format. Supported formats: CSV, Excel, JSON.")
+        return None, None
     try:
-        if file_extension == 'csv':
-            return pd.read_csv(file)
-        elif file_extension in ['xls', 'xlsx']:
-            return pd.read_excel(file)
-        elif file_extension == 'json':
-            return pd.read_json(file)
-        else:
-            st.error("Unsupported file format. Supported formats: CSV, Excel, JSON.")
+        df = downcast_numeric(loader(file_bytes))
+        return df, summarize(df)
     except Exception as e:
         st.error(f"Error loading file: {str(e)}")
-        return None
+        return None, None
+
+# Function to hash dataframes for caching
+def hash_dataframe(df):
+    """Hash every row plus the column labels and dtypes of a dataframe.
+
+    Streamlit's built-in hashing samples frames of 100k+ rows, so two cleaned frames
+    that differ only in imputed rows could otherwise share a cache entry.
+    """
+    try:
+        row_hashes = pd.util.hash_pandas_object(df, index=True)
+    except TypeError:
+        # Unhashable cells (e.g. lists from nested JSON)
+        row_hashes = pd.util.hash_pandas_object(df.astype(str), index=True)
+    return (df.columns.tolist(), df.dtypes.astype(str).tolist(), row_hashes.values.tobytes())
+
+DATAFRAME_HASH_FUNCS = {pd.DataFrame: hash_dataframe}
 
 # Function to get numeric columns
 def get_numeric_columns(df):
     """Return list of numeric columns in dataframe."""
-    return df.select_dtypes(include=[np.number]).columns.tolist()
+    # Inspect dtypes directly instead of building a select_dtypes view. Same selection as
+    # np.number: bools are excluded, timedeltas are included
+    return [
+        col for col, dtype in df.dtypes.items()
+        if (pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype))
+        or pd.api.types.is_timedelta64_dtype(dtype)
+    ]
 
 # Function to clean data
-def clean_data(df, cleaning_options):
+@st.cache_data(show_spinner=False, hash_funcs=DATAFRAME_HASH_FUNCS)
+def clean_data(df, cleaning_options, missing_strategy="Drop rows", scaling_method="StandardScaler"):
     """Clean dataframe based on selected options."""
     if df is None:
         return None
     
-    cleaned_df = df.copy()
+    # Shallow copy: with copy-on-write only the columns we modify get duplicated
+    cleaned_df = df.copy(deep=False)
     changes = []
     
     if 'remove_duplicates' in cleaning_options:
@@ -93,100 +252,165 @@ def clean_data(df, cleaning_options):
             changes.append(f"Removed {initial_rows - len(cleaned_df)} duplicate rows")
     
     if 'handle_missing' in cleaning_options:
-        missing_strategy = st.selectbox(
-            "Choose missing value strategy",
-            ["Drop rows", "Mean imputation", "Median imputation", "Zero imputation"]
-        )
-        
         initial_missing = cleaned_df.isnull().sum().sum()
         
         if missing_strategy == "Drop rows":
             cleaned_df = cleaned_df.dropna()
         else:
             numeric_columns = get_numeric_columns(cleaned_df)
-            for col in numeric_columns:
-                if cleaned_df[col].isnull().any():
-                    if missing_strategy == "Mean imputation":
-                        cleaned_df[col] = cleaned_df[col].fillna(cleaned_df[col].mean())
-                    elif missing_strategy == "Median imputation":
-                        cleaned_df[col] = cleaned_df[col].fillna(cleaned_df[col].median())
-                    elif missing_strategy == "Zero imputation":
-                        cleaned_df[col] = cleaned_df[col].fillna(0)
+            numeric_df = cleaned_df[numeric_columns]
+            if missing_strategy == "Mean imputation":
+                cleaned_df[numeric_columns] = numeric_df.fillna(numeric_df.mean())
+            elif missing_strategy == "Median imputation":
+                cleaned_df[numeric_columns] = numeric_df.fillna(numeric_df.median())
+            elif missing_strategy == "Zero imputation":
+                cleaned_df[numeric_columns] = numeric_df.fillna(0)
         
         final_missing = cleaned_df.isnull().sum().sum()
         if initial_missing > final_missing:
             changes.append(f"Handled {initial_missing - final_missing} missing values")
     
     if 'normalize_data' in cleaning_options:
-        scaling_method = st.selectbox(
-            "Choose scaling method",
-            ["StandardScaler", "MinMaxScaler"]
-        )
-        
         numeric_columns = get_numeric_columns(cleaned_df)
         if numeric_columns:
+            values = cleaned_df[numeric_columns].to_numpy(dtype=np.float32, copy=True)
             if scaling_method == "StandardScaler":
-                scaler = StandardScaler()
+                offset = np.nanmean(values, axis=0)
+                scale = np.nanstd(values, axis=0)
             else:
-                scaler = MinMaxScaler()
-                
-            cleaned_df[numeric_columns] = scaler.fit_transform(cleaned_df[numeric_columns])
+                offset = np.nanmin(values, axis=0)
+                scale = np.nanmax(values, axis=0) - offset
+            # Constant columns are left unscaled, as sklearn's scalers do
+            scale[scale == 0] = 1
+            values -= offset
+            values /= scale
+            
+            cleaned_df[numeric_columns] = values
             changes.append(f"Normalized {len(numeric_columns)} numeric columns using {scaling_method}")
     
     return cleaned_df, changes
 
+# Function to thin out large frames
+def downsample(df, target=DOWNSAMPLE_TARGET):
+    """Return an evenly strided subset of about `target` rows, keeping the first and last."""
+    if len(df) <= target:
+        return df
+    return df.iloc[np.linspace(0, len(df) - 1, target).astype(int)]
+
+# Function to compute correlations
+def get_corr(df):
+    """Return the correlation matrix of the numeric columns."""
+    return df.corr(numeric_only=True)
+
+# Function to build the uncolored figure
+def build_fig(df, chart_type, x_col, y_col, color_col=None):
+    """Build the figure for the selected chart type and columns, leaving colors at their defaults."""
+    if chart_type in ["Line Chart", "Area Chart", "Scatter Plot", "Bubble Chart"] and len(df) > DOWNSAMPLE_THRESHOLD:
+        df = downsample(df)
+
+    if chart_type == "Bar Chart":
+        fig = px.bar(df, x=x_col, y=y_col, color=color_col)
+    elif chart_type == "Line Chart":
+        fig = px.line(df, x=x_col, y=y_col, color=color_col)
+    elif chart_type == "Scatter Plot":
+        fig = px.scatter(df, x=x_col, y=y_col, color=color_col)
+    elif chart_type == "Box Plot":
+        fig = px.box(df, x=x_col, y=y_col, color=color_col)
+    elif chart_type == "Histogram":
+        fig = px.histogram(df, x=x_col, color=color_col)
+    elif chart_type == "Pie Chart":
+        fig = px.pie(df, names=x_col, values=y_col, color=color_col)
+    elif chart_type == "Area Chart":
+        fig = px.area(df, x=x_col, y=y_col, color=color_col)
+    elif chart_type == "Violin Plot":
+        fig = px.violin(df, x=x_col, y=y_col, color=color_col)
+    elif chart_type == "Heatmap":
+        fig = px.imshow(get_corr(df), text_auto=True)
+    elif chart_type == "3D Scatter Plot":
+        fig = px.scatter_3d(df, x=x_col, y=y_col, z=color_col, color=color_col)
+    elif chart_type == "3D Surface Plot":
+        # Typed, contiguous float32 grid so Plotly can encode it as a binary array
+        z = np.ascontiguousarray(df[get_numeric_columns(df)].to_numpy(dtype=np.float32))
+        fig = go.Figure(data=[go.Surface(z=z)])
+    elif chart_type == "Bubble Chart":
+        fig = px.scatter(df, x=x_col, y=y_col, size=y_col, color=color_col)
+    elif chart_type == "Radar Chart":
+        fig = px.line_polar(df, r=y_col, theta=x_col, color=color_col, line_close=True)
+    elif chart_type == "Polar Chart":
+        fig = px.scatter_polar(df, r=y_col, theta=x_col, color=color_col)
+    elif chart_type == "Tree Map":
+        fig = px.treemap(df, path=[x_col], values=y_col, color=color_col)
+    elif chart_type == "Sunburst Chart":
+        fig = px.sunburst(df, path=[x_col], values=y_col, color=color_col)
+    elif chart_type == "Funnel Chart":
+        fig = px.funnel(df, x=x_col, y=y_col, color=color_col)
+    elif chart_type == "Gantt Chart":
+        fig = px.timeline(df, x_start=x_col, x_end=y_col, y=color_col, color=color_col)
+    elif chart_type == "Candlestick Chart":
+        fig = go.Figure(data=[go.Candlestick(x=df[x_col], open=df['Open'], high=df['High'], low=df['Low'], close=df['Close'])])
+    
+    # Customize layout
+    fig.update_layout(
+        title=f"{chart_type} of {y_col} vs {x_col}",
+        xaxis_title=x_col,
+        yaxis_title=y_col,
+        template="plotly_white"
+    )
+    
+    return fig
+
+# Function to cache the serialized figure
+@st.cache_data(show_spinner=False, hash_funcs=DATAFRAME_HASH_FUNCS)
+def fig_json(df, chart_type, x_col, y_col, color_col=None):
+    """Return the built figure as JSON; serializing is the expensive step, so only data changes redo it."""
+    return build_fig(df, chart_type, x_col, y_col, color_col).to_json()
+
+# Function to recolor discrete traces
+def set_discrete_colors(fig, colors):
+    """Cycle `colors` over the traces (or slices) of a figure, leaving continuous color scales alone."""
+    for i, trace in enumerate(fig.data):
+        if trace.type in ["pie", "treemap", "sunburst"]:
+            fig.update_layout({f"{trace.type}colorway": colors})
+            # px sets per-slice colors explicitly when a color column is chosen
+            if trace.marker.colors is not None and not getattr(trace.marker, "coloraxis", None):
+                trace.marker.colors = [colors[j % len(colors)] for j in range(len(trace.marker.colors))]
+        elif trace.type in ["surface", "candlestick", "heatmap"]:
+            continue
+        else:
+            color = colors[i % len(colors)]
+            if "lines" in (getattr(trace, "mode", None) or ""):
+                trace.line.color = color
+            # Leave continuous (per-point) marker colors alone
+            if trace.marker.color is None or isinstance(trace.marker.color, str):
+                trace.marker.color = color
+
+# Function to color a built figure
+def apply_style(fig, chart_type, color_theme=None, custom_color=None):
+    """Apply the selected color theme, or the custom color when no theme is chosen, without touching the data."""
+    if color_theme in pio.templates:
+        fig.update_layout(template=color_theme)
+        template_layout = pio.templates[color_theme].layout
+        if template_layout.colorscale.sequential:
+            fig.update_coloraxes(colorscale=template_layout.colorscale.sequential)
+        if template_layout.colorway:
+            set_discrete_colors(fig, list(template_layout.colorway))
+    elif color_theme:
+        fig.update_coloraxes(colorscale=color_theme)
+        samples = [i / (THEME_COLOR_SAMPLES - 1) for i in range(THEME_COLOR_SAMPLES)]
+        set_discrete_colors(fig, px.colors.sample_colorscale(color_theme, samples))
+    elif custom_color:
+        if chart_type == "Heatmap":
+            fig.update_coloraxes(colorscale=[[0, "white"], [1, custom_color]])
+        else:
+            set_discrete_colors(fig, [custom_color])
+    return fig
+
 # Function to create visualizations
 def create_visualization(df, chart_type, x_col, y_col, color_col=None, color_theme=None, custom_color=None):
     """Create visualization based on selected chart type and columns."""
     try:
-        if chart_type == "Bar Chart":
-            fig = px.bar(df, x=x_col, y=y_col, color=color_col, color_discrete_sequence=[custom_color] if custom_color else color_theme)
-        elif chart_type == "Line Chart":
-            fig = px.line(df, x=x_col, y=y_col, color=color_col, color_discrete_sequence=[custom_color] if custom_color else color_theme)
-        elif chart_type == "Scatter Plot":
-            fig = px.scatter(df, x=x_col, y=y_col, color=color_col, color_discrete_sequence=[custom_color] if custom_color else color_theme)
-        elif chart_type == "Box Plot":
-            fig = px.box(df, x=x_col, y=y_col, color=color_col, color_discrete_sequence=[custom_color] if custom_color else color_theme)
-        elif chart_type == "Histogram":
-            fig = px.histogram(df, x=x_col, color=color_col, color_discrete_sequence=[custom_color] if custom_color else color_theme)
-        elif chart_type == "Pie Chart":
-            fig = px.pie(df, names=x_col, values=y_col, color=color_col, color_discrete_sequence=[custom_color] if custom_color else color_theme)
-        elif chart_type == "Area Chart":
-            fig = px.area(df, x=x_col, y=y_col, color=color_col, color_discrete_sequence=[custom_color] if custom_color else color_theme)
-        elif chart_type == "Violin Plot":
-            fig = px.violin(df, x=x_col, y=y_col, color=color_col, color_discrete_sequence=[custom_color] if custom_color else color_theme)
-        elif chart_type == "Heatmap":
-            fig = px.imshow(df.corr(), text_auto=True, color_continuous_scale=custom_color if custom_color else color_theme)
-        elif chart_type == "3D Scatter Plot":
-            fig = px.scatter_3d(df, x=x_col, y=y_col, z=color_col, color=color_col, color_discrete_sequence=[custom_color] if custom_color else color_theme)
-        elif chart_type == "3D Surface Plot":
-            fig = go.Figure(data=[go.Surface(z=df.values)])
-        elif chart_type == "Bubble Chart":
-            fig = px.scatter(df, x=x_col, y=y_col, size=y_col, color=color_col, color_discrete_sequence=[custom_color] if custom_color else color_theme)
-        elif chart_type == "Radar Chart":
-            fig = px.line_polar(df, r=y_col, theta=x_col, color=color_col, line_close=True, color_discrete_sequence=[custom_color] if custom_color else color_theme)
-        elif chart_type == "Polar Chart":
-            fig = px.scatter_polar(df, r=y_col, theta=x_col, color=color_col, color_discrete_sequence=[custom_color] if custom_color else color_theme)
-        elif chart_type == "Tree Map":
-            fig = px.treemap(df, path=[x_col], values=y_col, color=color_col, color_discrete_sequence=[custom_color] if custom_color else color_theme)
-        elif chart_type == "Sunburst Chart":
-            fig = px.sunburst(df, path=[x_col], values=y_col, color=color_col, color_discrete_sequence=[custom_color] if custom_color else color_theme)
-        elif chart_type == "Funnel Chart":
-            fig = px.funnel(df, x=x_col, y=y_col, color=color_col, color_discrete_sequence=[custom_color] if custom_color else color_theme)
-        elif chart_type == "Gantt Chart":
-            fig = px.timeline(df, x_start=x_col, x_end=y_col, y=color_col, color=color_col, color_discrete_sequence=[custom_color] if custom_color else color_theme)
-        elif chart_type == "Candlestick Chart":
-            fig = go.Figure(data=[go.Candlestick(x=df[x_col], open=df['Open'], high=df['High'], low=df['Low'], close=df['Close'])])
-        
-        # Customize layout
-        fig.update_layout(
-            title=f"{chart_type} of {y_col} vs {x_col}",
-            xaxis_title=x_col,
-            yaxis_title=y_col,
-            template="plotly_white"
-        )
-        
-        return fig
+        fig = pio.from_json(fig_json(df, chart_type, x_col, y_col, color_col))
+        return apply_style(fig, chart_type, color_theme, custom_color)
     except Exception as e:
         st.error(f"Error creating visualization: {str(e)}")
         return None
@@ -254,6 +478,9 @@ def login_page():
         unsafe_allow_html=True
     )
     st.markdown('<div class="login-container"><h1>Login</h1></div>', unsafe_allow_html=True)
+    if st.session_state.logged_in:
+        st.info("You are already logged in.")
+        return
     with st.container():
         username = st.text_input("Username", key="login_username")
         password = st.text_input("Password", type="password", key="login_password")
@@ -338,17 +565,19 @@ def data_visualization_page():
     uploaded_file = st.file_uploader("Choose a file", type=['csv', 'xlsx', 'xls', 'json'])
     
     if uploaded_file is not None:
-        df = load_data(uploaded_file)
+        df, summary = load_data(uploaded_file.getvalue(), uploaded_file.name)
         
         if df is not None:
             st.success("File uploaded successfully!")
             
             # Display original data summary
             st.header("2. Original Data Summary")
-            st.write("Shape:", df.shape)
-            st.write("Columns:", df.columns.tolist())
-            st.write("Missing values:", df.isnull().sum())
-            st.write("Sample of data:", df.head())
+            st.json({
+                'Shape': summary['shape'],
+                'Columns': summary['columns'],
+                'Missing values': summary['missing']
+            })
+            st.dataframe(summary['head'])
             
             # Data cleaning options
             st.header("3. Data Cleaning")
@@ -358,7 +587,22 @@ def data_visualization_page():
                 default=["remove_duplicates"]
             )
             
-            cleaned_df, changes = clean_data(df, cleaning_options)
+            # Strategy widgets live here rather than in clean_data so it stays cacheable
+            missing_strategy = "Drop rows"
+            if 'handle_missing' in cleaning_options:
+                missing_strategy = st.selectbox(
+                    "Choose missing value strategy",
+                    ["Drop rows", "Mean imputation", "Median imputation", "Zero imputation"]
+                )
+            
+            scaling_method = "StandardScaler"
+            if 'normalize_data' in cleaning_options:
+                scaling_method = st.selectbox(
+                    "Choose scaling method",
+                    ["StandardScaler", "MinMaxScaler"]
+                )
+            
+            cleaned_df, changes = clean_data(df, tuple(cleaning_options), missing_strategy, scaling_method)
             
             if changes:
                 st.success("Cleaning operations completed:")
@@ -383,38 +627,43 @@ def data_visualization_page():
             cols = cleaned_df.columns.tolist()
             numeric_cols = get_numeric_columns(cleaned_df)
             
-            # Column selection based on chart type
-            if chart_type in ["Histogram", "Pie Chart", "Tree Map", "Sunburst Chart"]:
-                x_col = st.selectbox("Select column for visualization:", cols)
-                y_col = None
-            elif chart_type in ["Heatmap", "3D Surface Plot", "Candlestick Chart"]:
-                x_col = None
-                y_col = None
-            else:
-                x_col = st.selectbox("Select X-axis column:", cols)
-                y_col = st.selectbox("Select Y-axis column:", numeric_cols)
-            
-            color_col = st.selectbox("Select color column (optional):", [None] + cols)
-            
-            # Color theme selection
-            color_theme = st.selectbox(
-                "Select color theme:",
-                [
-                    None, "plotly", "plotly_white", "plotly_dark", "ggplot2", 
-                    "seaborn", "simple_white", "viridis", "inferno", "plasma", 
-                    "magma", "cividis", "rainbow", "portland", "bluered", "reds", 
-                    "greens", "blues", "picnic", "jet", "hot", "blackbody", 
-                    "earth", "electric", "viridis", "algae", "deep", "dense", 
-                    "gray", "haline", "ice", "matter", "solar", "speed", "tempo", 
-                    "thermal", "turbid", "balance", "curl", "delta", "oxy", 
-                    "edge", "hsv", "phase", "twilight", "mrybm", "mygbm"
-                ]
-            )
-            
-            # Custom color picker
-            custom_color = st.color_picker("Pick a custom color for the graph", "#4CAF50")
+            # Only the chart type drives the layout below; the rest is batched in a form
+            # so adjusting columns or colors doesn't rerun the whole page until submitted
+            with st.form("viz"):
+                # Column selection based on chart type
+                if chart_type in ["Histogram", "Pie Chart", "Tree Map", "Sunburst Chart"]:
+                    x_col = st.selectbox("Select column for visualization:", cols)
+                    y_col = None
+                elif chart_type in ["Heatmap", "3D Surface Plot", "Candlestick Chart"]:
+                    x_col = None
+                    y_col = None
+                else:
+                    x_col = st.selectbox("Select X-axis column:", cols)
+                    y_col = st.selectbox("Select Y-axis column:", numeric_cols)
+                
+                color_col = st.selectbox("Select color column (optional):", [None] + cols)
+                
+                # Color theme selection
+                color_theme = st.selectbox(
+                    "Select color theme:",
+                    [
+                        None, "plotly", "plotly_white", "plotly_dark", "ggplot2", 
+                        "seaborn", "simple_white", "viridis", "inferno", "plasma", 
+                        "magma", "cividis", "rainbow", "portland", "bluered", "reds", 
+                        "greens", "blues", "picnic", "jet", "hot", "blackbody", 
+                        "earth", "electric", "viridis", "algae", "deep", "dense", 
+                        "gray", "haline", "ice", "matter", "solar", "speed", "tempo", 
+                        "thermal", "turbid", "balance", "curl", "delta", "oxy", 
+                        "edge", "hsv", "phase", "twilight", "mrybm", "mygbm"
+                    ]
+                )
+                
+                # Custom color picker
+                custom_color = st.color_picker("Pick a custom color for the graph (used when no color theme is selected)", "#4CAF50")
+                
+                submitted = st.form_submit_button("Generate Visualization")
             
-            if st.button("Generate Visualization"):
+            if submitted:
                 fig = create_visualization(cleaned_df, chart_type, x_col, y_col, color_col, color_theme, custom_color)
                 if fig is not None:
                     st.plotly_chart(fig)